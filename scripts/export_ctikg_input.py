@@ -1,8 +1,87 @@
-import os, json, argparse, pandas as pd, re, pathlib
+import os, csv, json, argparse, mmap, re, pathlib
+try:
+    import numba, numpy as np
+except Exception:
+    numba = None
+
+_SENT = re.compile(r'(?<=[.!?])\s+')
 
 def sent_split(text):
     # simple sentence split; CTIKG will re-chunk anyway
-    return [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+    return [s for s in map(str.strip, _SENT.split(text)) if s]
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _ws_len(buf, i):
+        # byte length of the UTF-8 encoded char at i if it is one of Python's \s chars, else 0
+        n = buf.shape[0]
+        b = buf[i]
+        if b == 32 or (9 <= b <= 13) or (28 <= b <= 31):
+            return 1
+        if b == 0xC2 and i + 1 < n and (buf[i+1] == 0x85 or buf[i+1] == 0xA0):
+            return 2
+        if i + 2 < n:
+            b1 = buf[i+1]; b2 = buf[i+2]
+            if b == 0xE1 and b1 == 0x9A and b2 == 0x80:
+                return 3
+            if b == 0xE2 and b1 == 0x80 and (b2 <= 0x8A or b2 == 0xA8 or b2 == 0xA9 or b2 == 0xAF):
+                return 3
+            if b == 0xE2 and b1 == 0x81 and b2 == 0x9F:
+                return 3
+            if b == 0xE3 and b1 == 0x80 and b2 == 0x80:
+                return 3
+        return 0
+
+    @numba.njit(cache=True)
+    def split_offsets(buf):
+        """(end, next_start) byte offsets of every `[.!?]` + whitespace-run boundary."""
+        n = buf.shape[0]
+        out = np.empty((n // 2 + 1, 2), dtype=np.int64)
+        k = 0
+        i = 0
+        while i < n:
+            b = buf[i]
+            i += 1
+            if b == 46 or b == 33 or b == 63:
+                j = i
+                while j < n:
+                    w = _ws_len(buf, j)
+                    if w == 0:
+                        break
+                    j += w
+                if j > i:
+                    out[k, 0] = i; out[k, 1] = j; k += 1
+                    i = j
+        return out[:k]
+
+    def _split_spans(data):
+        # boundaries found on the raw UTF-8 bytes; only the sentence spans get decoded
+        offs = split_offsets(np.frombuffer(data, dtype=np.uint8))
+        starts = [0] + offs[:, 1].tolist()
+        ends = offs[:, 0].tolist() + [len(data)]
+        return [s for s in (data[a:b].decode("utf-8", errors="ignore").strip() for a, b in zip(starts, ends)) if s]
+
+    def sent_split(text):
+        # same boundaries as the regex version, scanned over UTF-8 bytes in compiled code
+        return _split_spans(text.encode("utf-8", errors="ignore"))
+
+def read_sentences(path):
+    """Sentences of a UTF-8 txt artifact, read through mmap. With numba, valid UTF-8
+    without \r is scanned as bytes; anything else (invalid bytes are dropped before
+    splitting, \r is translated as text-mode reads would) is split as decoded str."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if numba is not None and mm.find(b"\r") == -1:
+                try:
+                    mm[:].decode("utf-8")  # strict: the byte scan must see what the str split would
+                except UnicodeDecodeError:
+                    pass
+                else:
+                    return _split_spans(mm)
+            txt = mm[:].decode("utf-8", errors="ignore")
+    return sent_split(txt.replace("\r\n", "\n").replace("\r", "\n"))
 
 def main():
     ap = argparse.ArgumentParser()
@@ -13,18 +92,21 @@ def main():
 
     base = pathlib.Path(".")
     meta = []
-    rows = []
-    with open(args.in_jsonl,"r",encoding="utf-8") as f:
+    n_rows = 0
+    # stream one CSV row per sentence instead of buffering the whole corpus
+    with open(args.out_csv,"w",newline="",encoding="utf-8") as out_f, \
+            open(args.in_jsonl,"r",encoding="utf-8") as f:
+        out_w = csv.DictWriter(out_f, fieldnames=["sentence","category","url","source_domain","title"], lineterminator="\n")
+        out_w.writeheader()
         for line in f:
             rec = json.loads(line)
             if rec.get("status")!="ok": continue
             p = rec.get("txt_path","")
             if not p or not os.path.exists(p): continue
             try:
-                txt = open(p,encoding="utf-8",errors="ignore").read()
+                sents = read_sentences(p)
             except:
                 continue
-            sents = sent_split(txt)
             if not sents: continue
             # doc-level meta
             m = {
@@ -38,18 +120,18 @@ def main():
             meta.append(m)
             # row-per-sentence
             for s in sents:
-                rows.append({
+                out_w.writerow({
                     "sentence": s,
                     "category": m["category"],
                     "url": m["url"],
                     "source_domain": m["source_domain"],
                     "title": m["title"]
                 })
-    pd.DataFrame(rows).to_csv(args.out_csv, index=False)
+            n_rows += len(sents)
     with open(args.out_docs,"w",encoding="utf-8") as w:
         for m in meta:
             w.write(json.dumps(m, ensure_ascii=False)+"\n")
-    print("[OK] Sentences:", len(rows))
+    print("[OK] Sentences:", n_rows)
     print("[OK] Docs meta:", len(meta))
     print("[OK] Wrote:", args.out_csv, "and", args.out_docs)
 
@@ -1,8 +1,28 @@
 #!/usr/bin/env python3
-import pandas as pd, re, os, sys
+import numpy as np, pandas as pd, re, os, sys
+try:
+    import pyarrow as pa, pyarrow.csv as pacsv
+except Exception:
+    pa = pacsv = None
+
+# queue columns that must stay text (pyarrow would otherwise infer timestamps)
+TEXT_COLS = ["ID","URL","Source_Domain","Source_Type","Title","Snippet","Publish_Date",
+             "Category_Guess","Reason","Status","Collected_By","Added_On","Last_Checked"]
+
+def read_queue(path):
+    """Multi-threaded pyarrow CSV parse when available; plain pandas otherwise."""
+    if pacsv is None:
+        return pd.read_csv(path)
+    tbl = pacsv.read_csv(
+        path,
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),  # Snippet holds raw HTML
+        convert_options=pacsv.ConvertOptions(column_types={c: pa.string() for c in TEXT_COLS},
+                                             strings_can_be_null=True),
+    )
+    return tbl.to_pandas()
 
 in_path = sys.argv[1] if len(sys.argv) > 1 else "Links_Queue_sorted.csv"
-df = pd.read_csv(in_path)
+df = read_queue(in_path)
 
 # ensure columns exist
 for col in ["Title","Snippet","Source_Domain","Category_Guess","Score","Publish_Date","Status"]:
@@ -28,7 +48,11 @@ reputable = [
     "threatpost.com","zdnet.com","scmagazine.com","bankinfosecurity.com",
     "infosecurity-magazine.com","bleepingcomputer.com"
 ]
-df["RepFlag"] = df["Source_Domain"].str.lower().apply(lambda d: int(any(dom in d for dom in reputable)))
+def any_token(tokens):
+    """One alternation regex so a substring scan runs in a single vectorized pass."""
+    return re.compile("|".join(map(re.escape, tokens)))
+
+df["RepFlag"] = df["Source_Domain"].str.lower().str.contains(any_token(reputable)).astype("int8")
 
 # signal tokens
 CVE_RE = re.compile(r"cve-\d{4}-\d{4,7}", re.I)
@@ -38,15 +62,34 @@ mining = ["xmrig","xmr-stak","stratum","monero","nicehash"]
 nfs    = ["nfs","lustre","gpfs","beegfs","root_squash","no_root_squash","/etc/exports","ganesha","krb5","krb5p","krb5i"]
 ssh    = ["ssh ","sshd","authorized_keys","known_hosts","kerberos","gssapi","password spraying","credential stuffing"]
 
-df["has_CVE"]      = text.apply(lambda t: int(bool(CVE_RE.search(t))))
-df["has_TID"]      = text.apply(lambda t: int(bool(TID_RE.search(t))))
-df["has_IOC"]      = text.apply(lambda t: int(any(tok in t for tok in iotoks)))
-df["has_MiningTok"]= text.apply(lambda t: int(any(tok in t for tok in mining)))
-df["has_NFSTok"]   = text.apply(lambda t: int(any(tok in t for tok in nfs)))
-df["has_SSHTok"]   = text.apply(lambda t: int(any(tok in t for tok in ssh)))
+# one fused scan: every group is tried at each position inside a zero-width
+# lookahead, so overlapping tokens (e.g. "hash" inside "nicehash") still count;
+# `text` is already lowercased, so CVE_RE's re.I is not needed here
+FLAG_GROUPS = [
+    ("has_CVE",       "cve",    CVE_RE.pattern),
+    ("has_TID",       "tid",    TID_RE.pattern),
+    ("has_IOC",       "ioc",    "|".join(map(re.escape, iotoks))),
+    ("has_MiningTok", "mining", "|".join(map(re.escape, mining))),
+    ("has_NFSTok",    "nfs",    "|".join(map(re.escape, nfs))),
+    ("has_SSHTok",    "ssh",    "|".join(map(re.escape, ssh))),
+]
+MEGA = re.compile("(?=" + "|".join(f"(?P<{g}>{pat})" for _, g, pat in FLAG_GROUPS) + ")")
+BIT = {g: 1 << i for i, (_, g, _) in enumerate(FLAG_GROUPS)}
+ALL_BITS = (1 << len(FLAG_GROUPS)) - 1
+
+def flag_mask(t):
+    mask = 0
+    for m in MEGA.finditer(t):
+        mask |= BIT[m.lastgroup]
+        if mask == ALL_BITS: break
+    return mask
+
+masks = np.fromiter((flag_mask(t) for t in text.values), dtype=np.uint8, count=len(text))
+for i, (col, _, _) in enumerate(FLAG_GROUPS):
+    df[col] = (masks >> i) & 1
 
 # flags/scores
-df["SigFlag"]  = ((df["has_CVE"]+df["has_TID"]+df["has_IOC"]+df["has_MiningTok"]+df["has_NFSTok"]+df["has_SSHTok"])>0).astype(int)
+df["SigFlag"]  = (masks > 0).astype("int8")
 df["Quality2"] = df["RepFlag"] + df["SigFlag"]                      # 0..2
 df["Quality4"] = df["RepFlag"] + df["has_CVE"] + df["has_TID"] + df["has_IOC"]  # 0..4
 
@@ -69,14 +112,17 @@ cats = ["SSH & Credential Abuse","Cryptomining on HPC","NFS / File-Share Exposur
 for c in cats: triage(c, 200)
 
 # suggested Selected master
+# collect strong rows (topped up with best-by-Score) per category in order, then
+# drop repeat URLs once at the end -- first occurrence wins, as before
+cols = ["URL","Title","Source_Domain","Category_Guess","Publish_Date","Score","RepFlag","SigFlag","Quality2","Quality4","Status"]
 suggested = []
 for c in cats:
-    sub = df[df["Category_Guess"] == c].copy().sort_values("Score", ascending=False)
+    sub = df[df["Category_Guess"] == c].sort_values("Score", ascending=False)
     strong = sub[sub["Quality4"] >= 2].head(120)
-    if len(strong) < 120:
-        strong = pd.concat([strong, sub.head(120)], ignore_index=True).drop_duplicates(subset=["URL"])
-    strong["Status"] = "Selected"
-    cols = ["URL","Title","Source_Domain","Category_Guess","Publish_Date","Score","RepFlag","SigFlag","Quality2","Quality4","Status"]
     suggested.append(strong[cols])
-pd.concat(suggested, ignore_index=True).drop_duplicates("URL").to_csv("Suggested_Selected_master.csv", index=False)
+    if len(strong) < 120:
+        suggested.append(sub[cols].head(120))
+master = pd.concat(suggested, ignore_index=True)
+master = master.loc[~master["URL"].duplicated()].assign(Status="Selected")
+master.to_csv("Suggested_Selected_master.csv", index=False)
 print("Wrote Suggested_Selected_master.csv")
@@ -1,10 +1,21 @@
 #!/usr/bin/env python3
 import sys, pandas as pd
+try:
+    import polars as pl
+except Exception:
+    pl = None
 if len(sys.argv) < 3:
     print("Usage: merge_dedupe.py out.csv in1.csv in2.csv ..."); sys.exit(1)
 out = sys.argv[1]
-dfs = [pd.read_csv(p) for p in sys.argv[2:]]
-df = pd.concat(dfs, ignore_index=True)
-df = df.drop_duplicates(subset=["URL"]).reset_index(drop=True)
-df.to_csv(out, index=False)
-print("Wrote", len(df), "rows to", out)
+if pl is not None:
+    # lazy plan: scan every batch as text, keep first row per URL, stream to disk
+    lf = pl.concat([pl.scan_csv(p, infer_schema=False) for p in sys.argv[2:]], how="diagonal")
+    lf.unique(subset=["URL"], keep="first", maintain_order=True).sink_csv(out)
+    n = pl.scan_csv(out, infer_schema=False).select(pl.len()).collect().item()
+else:
+    dfs = [pd.read_csv(p) for p in sys.argv[2:]]
+    df = pd.concat(dfs, ignore_index=True)
+    df = df.drop_duplicates(subset=["URL"]).reset_index(drop=True)
+    df.to_csv(out, index=False)
+    n = len(df)
+print("Wrote", n, "rows to", out)
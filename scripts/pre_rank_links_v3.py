@@ -1,9 +1,19 @@
 #!/usr/bin/env python3
 import argparse, json, math, re, sys, csv
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timezone
 from urllib.parse import urljoin
 import requests
+from requests.adapters import HTTPAdapter, Retry
+try:
+    import requests_cache
+except Exception:
+    requests_cache = None
 import feedparser
+import lxml.html
+import numpy as np
+import pandas as pd
 from dateutil import parser as dateparser
 
 UA = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36"}
@@ -11,96 +21,144 @@ CVE_RE = re.compile(r"CVE-\d{4}-\d{4,7}", re.I)
 MITRE_T_RE = re.compile(r"\bT\d{4}\b")
 IOC_TOKENS = ["sha256", "md5", "indicator", "ioc", "hash", "domain", "ip address"]
 
+def build_session(cache=False, pool_size=32):
+    if cache and requests_cache is not None:
+        requests_cache.install_cache("prerank_cache", expire_after=6*3600)
+    s = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    s.mount("http://", HTTPAdapter(max_retries=retries, pool_connections=pool_size, pool_maxsize=pool_size))
+    s.mount("https://", HTTPAdapter(max_retries=retries, pool_connections=pool_size, pool_maxsize=pool_size))
+    return s
+
+# shared by the fetch worker threads (connection reuse across feeds on one host);
+# main() rebuilds it with the on-disk cache enabled
+SESSION = build_session()
+
+@lru_cache(maxsize=None)
+def _compile(pattern):
+    """Compile a config-supplied regex once per run (None passes through)."""
+    return re.compile(pattern) if pattern else None
+
 def now_utc(): return datetime.now(timezone.utc)
 
+ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+HAS_DIGIT_RE = re.compile(r"\d")
+
 def parse_date(s):
-    if not s:
+    # cheap rejects first: nothing date-like can be shorter than "2025" or digit-free
+    if not s or len(s) < 4 or not HAS_DIGIT_RE.search(s):
         return None
+    dt = None
+    if ISO_DATE_RE.match(s):
+        # strict ISO-8601 fast path; anything it rejects goes through the full parser
+        try:
+            dt = dateparser.isoparse(s)
+        except (ValueError, OverflowError):
+            dt = None
     try:
-        dt = dateparser.parse(s)
+        if dt is None:
+            dt = dateparser.parse(s)
         if not dt.tzinfo:
             dt = dt.replace(tzinfo=timezone.utc)
         return dt
     except Exception:
         return None
 
-def recency_score(pub_dt, half_life_days):
-    if not pub_dt:
-        return 0.4
-    days = (now_utc() - pub_dt).days
+def score_entries(entries, categories, half_life_days):
+    """Vectorized scoring of collected (url, dom, type, title, summary, pub_dt, weight) entries.
+    Over title + summary (lowercased for token matches):
+    - cat_hits: per category, include hits minus exclude hits (floored at 0); the best
+      category wins, first in dict order on ties
+    - rscore: exp(-ln2/half_life * age_days), 0.4 when the date is unknown
+    - sscore: +2 CVE id, +1 MITRE T-id, +1 per IOC token
+    Score = 0.35*weight + 0.30*rscore + 0.25*cat_hits/3 + 0.10*min(sscore/3, 1)."""
+    # object dtype keeps pub_dt as the parsed datetimes (mixed tzinfo, None for unknown)
+    df = pd.DataFrame(entries, columns=["URL","Source_Domain","Source_Type","Title","Snippet","pub_dt","weight"],
+                      dtype=object)
+    df["weight"] = df["weight"].astype(float)
+    text = df["Title"].fillna("").astype(str) + " " + df["Snippet"].fillna("").astype(str)
+    low = text.str.lower()
+
+    def hits(words):
+        h = np.zeros(len(df), dtype=np.int64)
+        for w in words:
+            h += low.str.contains(w, regex=False).to_numpy(dtype=bool)
+        return h
+
+    # category hits: one column per category, first best wins (dict order)
+    names = list(categories)
+    if names:
+        H = np.column_stack([np.maximum(0, hits(c.get("include", [])) - hits(c.get("exclude", [])))
+                             for c in categories.values()])
+        df["cat_hits"] = H.max(axis=1)
+        df["Category_Guess"] = np.array(names, dtype=object)[H.argmax(axis=1)]
+    else:
+        df["cat_hits"] = -1
+        df["Category_Guess"] = ""
+
+    # recency: exponential decay, 0.4 when the date is unknown
+    now = now_utc()
+    known = df["pub_dt"].notna().to_numpy()
+    days = np.array([(now - d).days if d else 0 for d in df["pub_dt"]], dtype=np.float64)
     lam = math.log(2) / max(1, half_life_days)
-    return math.exp(-lam * max(days, 0))
-
-def keyword_score(text, category):
-    text_l = (text or "").lower()
-    inc = category.get("include", [])
-    exc = category.get("exclude", [])
-    inc_hits = sum(1 for w in inc if w in text_l)
-    exc_hits = sum(1 for w in exc if w in text_l)
-    return max(0, inc_hits - exc_hits)
-
-def signal_score(text):
-    s = 0
-    if CVE_RE.search(text or ""): s += 2
-    if MITRE_T_RE.search(text or ""): s += 1
-    tl = (text or "").lower()
-    s += sum(1 for tok in IOC_TOKENS if tok in tl)
-    return s
+    df["rscore"] = np.where(known, np.exp(-lam * np.maximum(days, 0)), 0.4)
 
-def pick_category(title, summary, categories):
-    best, best_score = None, -1
-    combined = " ".join([title or "", summary or ""])
-    for name, cat_def in categories.items():
-        k = keyword_score(combined, cat_def)
-        if k > best_score:
-            best_score, best = k, name
-    return best, best_score
-
-def fetch_feed(feed_url, verbose=False, timeout=25):
-    r = requests.get(feed_url, headers=UA, timeout=timeout, allow_redirects=True)
-    status = r.status_code
+    # signals: CVE (+2), MITRE T-ID (+1), +1 per IOC token
+    df["sscore"] = (2 * text.str.contains(CVE_RE).to_numpy(dtype=np.int64)
+                    + text.str.contains(MITRE_T_RE).to_numpy(dtype=np.int64)
+                    + hits(IOC_TOKENS))
+
+    df["Score"] = ((0.35*df["weight"]) + (0.30*df["rscore"]) + (0.25*(df["cat_hits"]/3.0))
+                   + (0.10*np.minimum(df["sscore"]/3.0, 1.0)))
+    return df
+
+def fetch_feed(feed_url, timeout=25):
+    """(HTTP status, parsed feed)."""
+    r = SESSION.get(feed_url, headers=UA, timeout=timeout, allow_redirects=True)
     d = feedparser.parse(r.content) if r.ok else feedparser.parse(feed_url)
-    if verbose:
-        print(f"[FEED] {feed_url} -> HTTP {status}; entries={len(getattr(d,'entries',[]))}; bozo={getattr(d,'bozo',False)}")
-    return d
+    return r.status_code, d
 
-def crawl_index(url, base=None, link_pattern=None, date_regex=None, verbose=False, timeout=25):
+def nearest_date(a, date_re=None, levels=3):
+    """Publish date for an index link: the closest <time> inside the link's own
+    item (enclosing elements that hold no other link), else `date_re` over the
+    item's text."""
+    item = a
+    for _ in range(levels):
+        parent = item.getparent()
+        if parent is None or sum(1 for _ in parent.iter("a")) > 1:
+            break
+        item = parent
+    for t in item.iter("time"):
+        pub_dt = parse_date(t.get("datetime") or t.text_content().strip())
+        if pub_dt:
+            return pub_dt
+    if date_re is not None:
+        dmatch = date_re.search(item.text_content())
+        if dmatch:
+            return parse_date(dmatch.group(1))
+    return None
+
+def crawl_index(url, base=None, link_pattern=None, date_regex=None, timeout=25):
     """
     Lightweight index crawler: fetch HTML and pull links matching regex.
-    We *do not* fetch article bodies here.
+    We *do not* fetch article bodies here. Fetch/parse errors propagate to the caller.
+    link_pattern / date_regex may be strings or precompiled patterns.
     """
-    try:
-        r = requests.get(url, headers=UA, timeout=timeout, allow_redirects=True)
-        r.raise_for_status()
-        html = r.text
-        links = []
-        lp = re.compile(link_pattern) if link_pattern else None
-        for m in re.finditer(r'href=["\']([^"\']+)["\']', html, flags=re.I):
-            href = m.group(1)
-            if lp and not lp.search(href):
-                continue
-            full = urljoin(base or url, href)
-            # crude title guess near the anchor tag
-            start = max(0, m.start()-120)
-            end = min(len(html), m.end()+120)
-            snippet = html[start:end]
-            # title heuristic
-            tmatch = re.search(r'>([^<>]{3,120})<', snippet)
-            title = (tmatch.group(1).strip() if tmatch else href).replace('\n',' ').strip()
-            # date heuristic
-            pub_dt = None
-            if date_regex:
-                dmatch = re.search(date_regex, snippet)
-                if dmatch:
-                    pub_dt = parse_date(dmatch.group(1))
-            links.append((full, title, pub_dt))
-        if verbose:
-            print(f"[INDEX] {url} -> {len(links)} candidates")
-        return links
-    except Exception as e:
-        if verbose:
-            print(f"[INDEX-ERR] {url}: {e}")
-        return []
+    r = SESSION.get(url, headers=UA, timeout=timeout, allow_redirects=True)
+    r.raise_for_status()
+    doc = lxml.html.fromstring(r.content)
+    links = []
+    lp = _compile(link_pattern) if isinstance(link_pattern, str) else link_pattern
+    dre = _compile(date_regex) if isinstance(date_regex, str) else date_regex
+    for a in doc.iter("a"):
+        href = (a.get("href") or "").strip()
+        # patterns are written against the raw href, so filter before resolving
+        if not href or (lp and not lp.search(href)):
+            continue
+        full = urljoin(base or url, href)
+        title = " ".join(a.text_content().split()) or (a.get("title") or "").strip() or href
+        links.append((full, title, nearest_date(a, dre)))
+    return links
 
 def main():
     ap = argparse.ArgumentParser()
@@ -109,64 +167,83 @@ def main():
     ap.add_argument("--out", default="Links_Queue.csv")
     ap.add_argument("--limit_per_feed", type=int, default=0)
     ap.add_argument("--half_life_days", type=int, default=180, help="Recency half-life (default 180 days)")
+    ap.add_argument("--workers", type=int, default=16, help="Concurrent feed/index fetches (default 16)")
+    ap.add_argument("--no_cache", action="store_true", help="Disable the 6h requests-cache for feed/index fetches")
     ap.add_argument("--verbose", action="store_true")
     args = ap.parse_args()
 
+    global SESSION
+    SESSION = build_session(cache=not args.no_cache, pool_size=max(32, args.workers))
+
     with open(args.sources, "r") as f: sources = json.load(f)
     with open(args.categories, "r") as f: categories = json.load(f)
 
-    rows, seen = [], set()
-
-    for dom, cfg in sources.get("domains", {}).items():
-        weight = float(cfg.get("weight", 0.5))
-        if args.verbose:
-            print(f"\n[DOMAIN] {dom} w={weight}")
-        # RSS feeds
-        for feed_url in cfg.get("rss", []):
-            try:
-                d = fetch_feed(feed_url, verbose=args.verbose)
-                entries = getattr(d, "entries", [])
-                if args.limit_per_feed and len(entries) > args.limit_per_feed:
-                    entries = entries[:args.limit_per_feed]
-                for e in entries:
-                    link = e.get("link");  title = e.get("title","")
-                    if not link or link in seen: continue
+    entries_raw, seen = [], set()
+
+    # Fetch every feed/index concurrently up front; results are then consumed (and logged)
+    # in config order below, so de-dup (first source wins) and --verbose output stay deterministic.
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        plan = []
+        for dom, cfg in sources.get("domains", {}).items():
+            weight = float(cfg.get("weight", 0.5))
+            feeds = [(u, pool.submit(fetch_feed, u)) for u in cfg.get("rss", [])]
+            indexes = []
+            for entry in cfg.get("indexes", []):
+                url = entry.get("url"); base = entry.get("base")
+                try:
+                    link_pat = _compile(entry.get("link_pattern")); date_re = _compile(entry.get("date_regex"))
+                    fut = pool.submit(crawl_index, url, base, link_pat, date_re)
+                except re.error as ex:
+                    fut = Future(); fut.set_exception(ValueError(f"bad pattern: {ex}"))
+                indexes.append((url, fut))
+            plan.append((dom, weight, feeds, indexes))
+
+        for dom, weight, feeds, indexes in plan:
+            if args.verbose:
+                print(f"\n[DOMAIN] {dom} w={weight}")
+            # RSS feeds
+            for feed_url, fut in feeds:
+                try:
+                    status, d = fut.result()
+                    entries = getattr(d, "entries", [])
+                    if args.verbose:
+                        print(f"[FEED] {feed_url} -> HTTP {status}; entries={len(entries)}; bozo={getattr(d,'bozo',False)}")
+                    if args.limit_per_feed and len(entries) > args.limit_per_feed:
+                        entries = entries[:args.limit_per_feed]
+                    for e in entries:
+                        link = e.get("link");  title = e.get("title","")
+                        if not link or link in seen: continue
+                        seen.add(link)
+                        summary = e.get("summary","") or e.get("description","")
+                        pub = e.get("published") or e.get("updated") or e.get("created") or ""
+                        entries_raw.append((link, dom, "RSS", title, summary, parse_date(pub), weight))
+                except Exception as ex:
+                    if args.verbose: print(f"[FEED-ERR] {feed_url}: {ex}")
+            # HTML index pages
+            for url, fut in indexes:
+                try:
+                    links = fut.result()
+                except Exception as ex:
+                    if args.verbose: print(f"[INDEX-ERR] {url}: {ex}")
+                    continue
+                if args.verbose:
+                    print(f"[INDEX] {url} -> {len(links)} candidates")
+                for link, title, pub_dt in links:
+                    if link in seen: continue
                     seen.add(link)
-                    summary = e.get("summary","") or e.get("description","")
-                    pub = e.get("published") or e.get("updated") or e.get("created") or ""
-                    pub_dt = parse_date(pub)
-                    cat_guess, cat_hits = pick_category(title, summary, categories)
-                    rscore = recency_score(pub_dt, args.half_life_days)
-                    sscore = signal_score(" ".join([title, summary]))
-                    score = (0.35*weight)+(0.30*rscore)+(0.25*(cat_hits/3.0))+(0.10*min(sscore/3.0,1.0))
-                    rows.append({
-                        "ID":"", "URL":link, "Source_Domain":dom, "Source_Type":"RSS",
-                        "Title":title, "Snippet":summary, "Publish_Date":pub_dt.isoformat() if pub_dt else "",
-                        "Category_Guess":cat_guess or "", "Score":round(score,4),
-                        "Reason":f"dom_w={weight}, rec={round(rscore,2)}, cat_hits={cat_hits}, sig={sscore}",
-                        "Status":"New", "Collected_By":"", "Added_On":datetime.utcnow().isoformat(), "Last_Checked":""
-                    })
-            except Exception as ex:
-                if args.verbose: print(f"[FEED-ERR] {feed_url}: {ex}")
-        # HTML index pages
-        for entry in cfg.get("indexes", []):
-            url = entry.get("url"); base = entry.get("base"); link_pat = entry.get("link_pattern"); date_re = entry.get("date_regex")
-            candidates = crawl_index(url, base, link_pat, date_re, verbose=args.verbose)
-            for link, title, pub_dt in candidates:
-                if link in seen: continue
-                seen.add(link)
-                summary = ""
-                cat_guess, cat_hits = pick_category(title, summary, categories)
-                rscore = recency_score(pub_dt, args.half_life_days)
-                sscore = signal_score(title)
-                score = (0.35*weight)+(0.30*rscore)+(0.25*(cat_hits/3.0))+(0.10*min(sscore/3.0,1.0))
-                rows.append({
-                    "ID":"", "URL":link, "Source_Domain":dom, "Source_Type":"INDEX",
-                    "Title":title, "Snippet":summary, "Publish_Date":pub_dt.isoformat() if pub_dt else "",
-                    "Category_Guess":cat_guess or "", "Score":round(score,4),
-                    "Reason":f"dom_w={weight}, rec={round(rscore,2)}, cat_hits={cat_hits}, sig={sscore}",
-                    "Status":"New", "Collected_By":"", "Added_On":datetime.utcnow().isoformat(), "Last_Checked":""
-                })
+                    entries_raw.append((link, dom, "INDEX", title, "", pub_dt, weight))
+
+    scored = score_entries(entries_raw, categories, args.half_life_days)
+    added_on = datetime.utcnow().isoformat()  # one timestamp for the whole run
+    rows = []
+    for r in scored.itertuples(index=False):
+        rows.append({
+            "ID":"", "URL":r.URL, "Source_Domain":r.Source_Domain, "Source_Type":r.Source_Type,
+            "Title":r.Title, "Snippet":r.Snippet, "Publish_Date":r.pub_dt.isoformat() if r.pub_dt else "",
+            "Category_Guess":r.Category_Guess or "", "Score":round(r.Score,4),
+            "Reason":f"dom_w={r.weight}, rec={round(r.rscore,2)}, cat_hits={r.cat_hits}, sig={r.sscore}",
+            "Status":"New", "Collected_By":"", "Added_On":added_on, "Last_Checked":""
+        })
 
     rows.sort(key=lambda r: r["Score"], reverse=True)
     out_cols = ["ID","URL","Source_Domain","Source_Type","Title","Snippet","Publish_Date",
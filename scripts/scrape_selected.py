@@ -17,7 +17,8 @@ Usage:
     --concurrency 4
 """
 
-import argparse, csv, hashlib, io, json, os, re, time, urllib.parse, warnings
+import argparse, csv, hashlib, io, json, os, pickle, queue, re, threading, time, urllib.parse, warnings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -29,11 +30,27 @@ except Exception:
     requests_cache = None
 
 from bs4 import BeautifulSoup
+try:
+    from selectolax.parser import HTMLParser
+except Exception:
+    HTMLParser = None
 try:
     import trafilatura
 except Exception:
     trafilatura = None
 
+try:
+    import xxhash
+except Exception:
+    xxhash = None
+
+try:
+    import pypdfium2 as pdfium
+except Exception:
+    pdfium = None
+# PDFium is not thread-safe; scrape workers take turns on it
+_PDFIUM_LOCK = threading.Lock()
+
 try:
     from pdfminer.high_level import extract_text as pdf_extract_text
 except Exception:
@@ -44,6 +61,8 @@ from urllib import robotparser
 from tqdm import tqdm
 
 UA = os.environ.get("SCRAPER_USER_AGENT", "ctikg-sol-phase1/0.1 (+https://github.com)")
+ROW_COLS = ["URL", "Category_Guess", "Source_Domain", "Title", "Publish_Date"]
+FLUSH_EVERY = 32  # records between explicit flushes of the log/JSONL outputs
 
 def mk_dirs(base):
     base = Path(base)
@@ -64,29 +83,85 @@ def sha256_bytes(b: bytes) -> str:
 def sha256_text(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8", errors="ignore")).hexdigest()
 
+def path_key(data) -> str:
+    """16-hex-char artifact filename key. Non-cryptographic xxh64 when available
+    (SHA-256 is kept for the integrity field only); sha256 prefix otherwise."""
+    if isinstance(data, str):
+        data = data.encode("utf-8", errors="ignore")
+    if xxhash is not None:
+        return xxhash.xxh64(data).hexdigest()
+    return sha256_bytes(data)[:16]
+
+def write_artifact(path, data, skip_existing=False):
+    """Atomic write (temp file + os.replace) so a crash never leaves a partial artifact.
+    skip_existing is for content-addressed paths, where an existing file is already identical."""
+    if skip_existing and os.path.exists(path):
+        return
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if isinstance(data, bytes):
+        with open(tmp, "wb") as f: f.write(data)
+    else:
+        with open(tmp, "w", encoding="utf-8") as f: f.write(data)
+    os.replace(tmp, path)
+
+ROBOTS_TTL_SEC = 7 * 24 * 3600
+
+def fetch_robots(dom, scheme="https"):
+    rp = robotparser.RobotFileParser()
+    try:
+        rp.set_url(f"{scheme}://{dom}/robots.txt"); rp.read()
+    except Exception:
+        # assume allowed if robots not reachable
+        return None
+    return rp
+
 def allowed_by_robots(rob_cache, url, ua) -> bool:
+    # rob_cache: domain -> (fetched_at_epoch, RobotFileParser | None)
     dom = normalized_domain(url)
     if dom not in rob_cache:
-        rp = robotparser.RobotFileParser()
         scheme = urllib.parse.urlparse(url).scheme or "https"
-        robots_url = f"{scheme}://{dom}/robots.txt"
-        try:
-            rp.set_url(robots_url); rp.read()
-        except Exception:
-            # assume allowed if robots not reachable
-            rob_cache[dom] = None
-            return True
-        rob_cache[dom] = rp
-    rp = rob_cache[dom]
+        rob_cache[dom] = (time.time(), fetch_robots(dom, scheme))
+    rp = rob_cache[dom][1]
     return True if rp is None else rp.can_fetch(ua, url)
 
-def build_session(cache=True):
+def prefetch_robots(rob_cache, urls, workers=8):
+    """Fetch robots.txt for every not-yet-cached domain in parallel, before scraping starts."""
+    todo = {}
+    for url in urls:
+        dom = normalized_domain(url)
+        if dom and dom not in rob_cache and dom not in todo:
+            todo[dom] = urllib.parse.urlparse(url).scheme or "https"
+    if not todo:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        fetched = ex.map(lambda item: fetch_robots(*item), todo.items())
+        for dom, rp in zip(todo, fetched):
+            rob_cache[dom] = (time.time(), rp)
+
+def load_robots_cache(path, ttl=ROBOTS_TTL_SEC):
+    try:
+        with open(path, "rb") as f:
+            cache = pickle.load(f)
+    except Exception:
+        return {}
+    now = time.time()
+    return {dom: entry for dom, entry in cache.items() if entry[1] is not None and now - entry[0] < ttl}
+
+def save_robots_cache(rob_cache, path):
+    # failed fetches (None = allow all) only hold for this run; they are retried next time
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({dom: entry for dom, entry in rob_cache.items() if entry[1] is not None}, f)
+    os.replace(tmp, path)
+
+def build_session(cache=True, pool_size=10):
     if cache and requests_cache is not None:
         requests_cache.install_cache("scraper_cache", expire_after=60*60*24*7)
     s = requests.Session()
     retries = Retry(total=3, backoff_factor=0.7, status_forcelist=[429, 500, 502, 503, 504])
-    s.mount("http://", HTTPAdapter(max_retries=retries))
-    s.mount("https://", HTTPAdapter(max_retries=retries))
+    pool = max(10, pool_size)
+    s.mount("http://", HTTPAdapter(max_retries=retries, pool_connections=pool, pool_maxsize=pool))
+    s.mount("https://", HTTPAdapter(max_retries=retries, pool_connections=pool, pool_maxsize=pool))
     s.headers.update({"User-Agent": UA, "Accept": "*/*"})
     return s
 
@@ -96,6 +171,11 @@ def is_pdf_response(resp, url):
     if re.search(r"\.pdf($|\?)", url.lower()): return True
     return False
 
+def _squeeze_lines(txt):
+    # lightweight de-dup of empty lines
+    lines = [ln.strip() for ln in txt.splitlines()]
+    return "\n".join([ln for ln in lines if ln])
+
 def clean_html_to_text(html, base_url=None):
     txt = ""
     if trafilatura is not None:
@@ -103,19 +183,45 @@ def clean_html_to_text(html, base_url=None):
             txt = trafilatura.extract(html, include_comments=False, include_tables=False, url=base_url) or ""
         except Exception:
             txt = ""
+    if not txt and HTMLParser is not None:
+        # C-backed fallback; much cheaper than BeautifulSoup on large pages
+        try:
+            tree = HTMLParser(html)
+            for node in tree.css("script,style,noscript"): node.decompose()
+            txt = _squeeze_lines(tree.root.text(separator="\n")) if tree.root is not None else ""
+        except Exception:
+            txt = ""
     if not txt:
         try:
             soup = BeautifulSoup(html, "lxml")
             for s in soup(["script","style","noscript"]): s.extract()
-            txt = soup.get_text(separator="\n")
-            # lightweight de-dup of empty lines
-            lines = [ln.strip() for ln in txt.splitlines()]
-            txt = "\n".join([ln for ln in lines if ln])
+            txt = _squeeze_lines(soup.get_text(separator="\n"))
         except Exception:
             txt = ""
     return txt
 
+def _pdfium_text(b):
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(b)
+        try:
+            parts = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                parts.append(textpage.get_text_range())
+                textpage.close(); page.close()
+            return "\n".join(parts)
+        finally:
+            pdf.close()
+
 def pdf_bytes_to_text(b):
+    # PDFium (C++) first; pure-Python pdfminer as the fallback
+    if pdfium is not None:
+        try:
+            txt = _pdfium_text(b)
+            if txt.strip():
+                return txt
+        except Exception:
+            pass
     if pdf_extract_text is None:
         return ""
     try:
@@ -125,6 +231,99 @@ def pdf_bytes_to_text(b):
     except Exception:
         return ""
 
+def scrape_one(row, sess, artifacts, robots_cache, ignore_robots=False):
+    """Fetch + extract a single queue row (a plain tuple in ROW_COLS order).
+    Returns (log_row, jsonl_record_or_None)."""
+    url, cat, src, ttl, pdate = row
+    base_row = {"URL": url, "Category": cat, "Source_Domain": src, "Title": ttl, "Publish_Date": pdate}
+
+    if not url:
+        return {**base_row, "Status":"skip", "Reason":"no_url"}, None
+
+    # robots
+    if not ignore_robots and not allowed_by_robots(robots_cache, url, UA):
+        return {**base_row, "Status":"blocked", "Reason":"robots.txt"}, None
+
+    try:
+        resp = sess.get(url, timeout=25)
+    except Exception as e:
+        return {**base_row, "Status":"error", "Reason": f"request:{e}"}, None
+
+    html_path = pdf_path = txt_path = ""
+    text_out = ""
+    raw_bytes = b""
+    status = "ok"; reason = ""
+    try:
+        if is_pdf_response(resp, url):
+            raw_bytes = resp.content or b""
+            if not raw_bytes:
+                status, reason = "error", "empty_pdf"
+            else:
+                fid = path_key(raw_bytes)
+                pdf_path = str(artifacts / "pdf" / f"{fid}.pdf")
+                write_artifact(pdf_path, raw_bytes, skip_existing=True)
+                text_out = pdf_bytes_to_text(raw_bytes)
+        else:
+            # HTML
+            html = resp.text or ""
+            if not html.strip():
+                status, reason = "error", "empty_html"
+            else:
+                fid = path_key(url)
+                html_path = str(artifacts / "html" / f"{fid}.html")
+                write_artifact(html_path, html)  # keyed by URL, so always refresh
+                text_out = clean_html_to_text(html, base_url=url)
+
+        if text_out:
+            fid_txt = path_key(text_out)
+            txt_path = str(artifacts / "txt" / f"{fid_txt}.txt")
+            write_artifact(txt_path, text_out, skip_existing=True)
+            doc_sha = sha256_text(text_out)
+        else:
+            doc_sha = ""
+            if status == "ok":  # no earlier error set
+                status, reason = "warn", "no_text_extracted"
+
+        # JSONL record
+        rec = {
+            "url": url,
+            "title": ttl,
+            "publish_date": pdate,
+            "source_domain": src,
+            "category": cat,
+            "fetched_at": datetime.utcnow().isoformat() + "Z",
+            "html_path": html_path or None,
+            "pdf_path": pdf_path or None,
+            "txt_path": txt_path or None,
+            "sha256": doc_sha,
+            "bytes": len(raw_bytes) if raw_bytes else None,
+            "status": status,
+            "reason": reason or None,
+        }
+        log_row = {
+            **base_row, "Status": status, "Reason": reason,
+            "html_path": html_path, "pdf_path": pdf_path, "txt_path": txt_path,
+            "sha256": doc_sha, "bytes": len(raw_bytes) if raw_bytes else 0,
+            "fetched_at": rec["fetched_at"]
+        }
+        return log_row, rec
+
+    except Exception as e:
+        return {**base_row, "Status":"error", "Reason": f"processing:{e}"}, None
+
+def scrape_domain(items, sess, artifacts, robots_cache, throttle_sec, results, stop, ignore_robots=False):
+    """Scrape one host's rows ((queue_pos, row) pairs) in order, one request at a time,
+    sleeping throttle_sec after each response. Each (queue_pos, log_row, rec) is put on
+    `results` as soon as it is done; returns early once `stop` is set."""
+    for k, (pos, row) in enumerate(items):
+        if stop.is_set():
+            return
+        log_row, rec = scrape_one(row, sess, artifacts, robots_cache, ignore_robots)
+        results.put((pos, log_row, rec))
+        # skip/blocked rows never reached the host
+        if k + 1 < len(items) and log_row["Status"] not in ("skip", "blocked"):
+            stop.wait(throttle_sec)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--in", dest="in_path", required=True)
@@ -132,9 +331,9 @@ def main():
     ap.add_argument("--jsonl", dest="jsonl_path", default="results/scraped_corpus.jsonl")
     ap.add_argument("--artifacts", default="artifacts")
     ap.add_argument("--max_per_category", type=int, default=120)
-    ap.add_argument("--concurrency", type=int, default=4)  # reserved for future; current is sequential + polite throttle
+    ap.add_argument("--concurrency", type=int, default=4)  # domains scraped in parallel; each domain is sequential
     ap.add_argument("--ignore_robots", action="store_true")
-    ap.add_argument("--throttle_sec", type=float, default=0.8)
+    ap.add_argument("--throttle_sec", type=float, default=0.8)  # min gap between requests to the same domain
     args = ap.parse_args()
 
     artifacts = mk_dirs(args.artifacts)
@@ -143,129 +342,92 @@ def main():
     df = pd.read_csv(args.in_path)
     if "Status" in df.columns:
         df = df[df["Status"].astype(str).str.lower() == "selected"]
-    if "Category_Guess" not in df.columns:
-        df["Category_Guess"] = ""
-    if "Publish_Date" not in df.columns:
-        df["Publish_Date"] = ""
-
-    # cap per category
-    keep = []
-    for cat, grp in df.groupby("Category_Guess"):
-        grp = grp.copy()
-        if "Score" in grp.columns:
-            grp = grp.sort_values("Score", ascending=False)
-        keep.append(grp.head(args.max_per_category))
-    df = pd.concat(keep, ignore_index=True).drop_duplicates(subset=["URL"])
-
-    sess = build_session(cache=True)
-    robots_cache = {}
-
-    # prepare outputs
-    log_f = open(args.log_csv, "w", newline="", encoding="utf-8")
+    for col in ROW_COLS:
+        if col not in df.columns:
+            df[col] = ""
+
+    # cap per category: heap-select the top Score rows per group (unscored rows rank last)
+    if "Score" in df.columns:
+        score = pd.to_numeric(df["Score"], errors="coerce").fillna(float("-inf"))
+        top = score.groupby(df["Category_Guess"], sort=False).nlargest(args.max_per_category)
+        df = df.loc[top.index.get_level_values(-1)]
+    else:
+        df = df.groupby("Category_Guess", sort=False).head(args.max_per_category)
+    df = df.drop_duplicates(subset=["URL"]).reset_index(drop=True)
+
+    sess = build_session(cache=True, pool_size=args.concurrency)
+    robots_path = artifacts / ".robots_cache.pkl"
+    robots_cache = load_robots_cache(robots_path)
+    if not args.ignore_robots:
+        prefetch_robots(robots_cache, df["URL"].dropna().astype(str), workers=max(8, args.concurrency))
+        save_robots_cache(robots_cache, robots_path)
+
+    # prepare outputs (64 KiB buffers; flushed every FLUSH_EVERY records, not per record, and
+    # closed only after every fetched row, including ones buffered at an interrupt, is written)
+    log_f = open(args.log_csv, "w", newline="", encoding="utf-8", buffering=1 << 16)
     log_w = csv.DictWriter(log_f, fieldnames=[
         "URL","Status","Reason","Category","Source_Domain","Title","Publish_Date",
         "html_path","pdf_path","txt_path","sha256","bytes","fetched_at"
     ])
     log_w.writeheader()
 
-    jsonl_f = open(args.jsonl_path, "a", encoding="utf-8")
-
-    pbar = tqdm(df.itertuples(index=False), total=len(df), desc="Scraping")
-    for row in pbar:
-        url = getattr(row, "URL", "")
-        cat = getattr(row, "Category_Guess", "")
-        src = getattr(row, "Source_Domain", "")
-        ttl = getattr(row, "Title", "")
-        pdate = getattr(row, "Publish_Date", "")
+    jsonl_f = open(args.jsonl_path, "a", encoding="utf-8", buffering=1 << 16)
 
-        if not url:
-            log_w.writerow({"URL": url, "Status":"skip", "Reason":"no_url", "Category": cat, "Source_Domain": src, "Title": ttl, "Publish_Date": pdate})
-            continue
+    # one job per host (hosts in parallel, each host sequential); jobs are submitted in order of first appearance
+    by_domain = {}
+    for pos, row in enumerate(df[ROW_COLS].itertuples(index=False, name=None)):
+        by_domain.setdefault(normalized_domain(row[0]), []).append((pos, row))
 
-        # robots
-        if not args.ignore_robots and not allowed_by_robots(robots_cache, url, UA):
-            log_w.writerow({"URL": url, "Status":"blocked", "Reason":"robots.txt", "Category": cat,
-                            "Source_Domain": src, "Title": ttl, "Publish_Date": pdate})
-            time.sleep(args.throttle_sec)
-            continue
+    # only the main thread touches log_w / jsonl_f; results are written in queue order
+    results, stop = queue.Queue(), threading.Event()
+    done, next_pos = {}, 0
 
-        try:
-            resp = sess.get(url, timeout=25)
-        except Exception as e:
-            log_w.writerow({"URL": url, "Status":"error", "Reason": f"request:{e}", "Category": cat,
-                            "Source_Domain": src, "Title": ttl, "Publish_Date": pdate})
-            time.sleep(args.throttle_sec); continue
-
-        html_path = pdf_path = txt_path = ""
-        text_out = ""
-        raw_bytes = b""
-        status = "ok"; reason = ""
-        try:
-            if is_pdf_response(resp, url):
-                raw_bytes = resp.content or b""
-                if not raw_bytes:
-                    status, reason = "error", "empty_pdf"
-                else:
-                    fid = sha256_bytes(raw_bytes)[:16]
-                    pdf_path = str(artifacts / "pdf" / f"{fid}.pdf")
-                    with open(pdf_path, "wb") as f: f.write(raw_bytes)
-                    text_out = pdf_bytes_to_text(raw_bytes)
-            else:
-                # HTML
-                html = resp.text or ""
-                if not html.strip():
-                    status, reason = "error", "empty_html"
-                else:
-                    fid = sha256_text(url)[:16]
-                    html_path = str(artifacts / "html" / f"{fid}.html")
-                    with open(html_path, "w", encoding="utf-8") as f: f.write(html)
-                    text_out = clean_html_to_text(html, base_url=url)
-
-            if text_out:
-                fid_txt = sha256_text(text_out)[:16]
-                txt_path = str(artifacts / "txt" / f"{fid_txt}.txt")
-                with open(txt_path, "w", encoding="utf-8") as f: f.write(text_out)
-                doc_sha = sha256_text(text_out)
-            else:
-                doc_sha = ""
-                if status == "ok":  # no earlier error set
-                    status, reason = "warn", "no_text_extracted"
-
-            # write JSONL record
-            rec = {
-                "url": url,
-                "title": ttl,
-                "publish_date": pdate,
-                "source_domain": src,
-                "category": cat,
-                "fetched_at": datetime.utcnow().isoformat() + "Z",
-                "html_path": html_path or None,
-                "pdf_path": pdf_path or None,
-                "txt_path": txt_path or None,
-                "sha256": doc_sha,
-                "bytes": len(raw_bytes) if raw_bytes else None,
-                "status": status,
-                "reason": reason or None,
-            }
+    def emit(log_row, rec):
+        if rec is not None:
             jsonl_f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-            jsonl_f.flush()
-
-            # log csv
-            log_w.writerow({
-                "URL": url, "Status": status, "Reason": reason, "Category": cat,
-                "Source_Domain": src, "Title": ttl, "Publish_Date": pdate,
-                "html_path": html_path, "pdf_path": pdf_path, "txt_path": txt_path,
-                "sha256": doc_sha, "bytes": len(raw_bytes) if raw_bytes else 0,
-                "fetched_at": rec["fetched_at"]
-            })
-
-        except Exception as e:
-            log_w.writerow({"URL": url, "Status":"error", "Reason": f"processing:{e}", "Category": cat,
-                            "Source_Domain": src, "Title": ttl, "Publish_Date": pdate})
-        finally:
-            time.sleep(args.throttle_sec)
+        log_w.writerow(log_row)
 
-    log_f.close(); jsonl_f.close()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as ex, \
+                tqdm(total=len(df), desc="Scraping") as pbar:
+            futures = [ex.submit(scrape_domain, items, sess, artifacts, robots_cache,
+                                 args.throttle_sec, results, stop, args.ignore_robots)
+                       for items in by_domain.values()]
+            try:
+                for _ in range(len(df)):
+                    while True:
+                        try:
+                            pos, log_row, rec = results.get(timeout=0.5)
+                            break
+                        except queue.Empty:
+                            # scrape_one handles its own errors; a dead job would otherwise stall the loop
+                            for fut in futures:
+                                if fut.done() and fut.exception() is not None:
+                                    raise fut.exception()
+                    done[pos] = (log_row, rec)
+                    pbar.update(1)
+                    while next_pos in done:
+                        emit(*done.pop(next_pos))
+                        next_pos += 1
+                        if next_pos % FLUSH_EVERY == 0:
+                            jsonl_f.flush(); log_f.flush()
+            except BaseException:
+                # stop queued and running domain jobs; in-flight requests finish, nothing new starts
+                stop.set()
+                ex.shutdown(wait=False, cancel_futures=True)
+                raise
+    finally:
+        # on an interrupt or error, keep everything already fetched: rows held back behind an
+        # unfinished queue position and rows the jobs finished while stopping, in queue order
+        while True:
+            try:
+                pos, log_row, rec = results.get_nowait()
+            except queue.Empty:
+                break
+            done[pos] = (log_row, rec)
+        for pos in sorted(done):
+            emit(*done[pos])
+        log_f.close(); jsonl_f.close()
     print(f"[DONE] Log: {args.log_csv}")
     print(f"[DONE] JSONL corpus: {args.jsonl_path}")
     print(f"[DONE] Artifacts in: {artifacts}")
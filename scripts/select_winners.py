@@ -4,6 +4,7 @@ select_winners.py
 -----------------
 Auto-selects "winners" per category from a queue CSV (with flags) and writes:
 - Updated queue CSV with Status=Selected for winners
+  (or, with --delta_only, just Status_delta.csv: URL + new status of the rows that changed)
 - Per-category Selected CSVs
 - Selected_master.csv (all winners)
 - Selected_summary.csv (counts per category)
@@ -22,12 +23,22 @@ Examples:
   python3 select_winners.py --in Links_Queue_sorted_flags.csv --per_category 120
   python3 select_winners.py --in Links_Queue_sorted_flags.csv --min_quality4 3
   python3 select_winners.py --in Links_Queue_sorted_flags.csv --reset_selected
+  python3 select_winners.py --in Links_Queue_sorted_flags.csv --delta_only
   python3 select_winners.py --in Links_Queue_sorted_flags.csv \
      --categories "SSH & Credential Abuse" "Cryptomining on HPC" "NFS / File-Share Exposure"
 """
 
-import argparse, os, re, sys
-import pandas as pd
+import argparse, functools, os, string, sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np, pandas as pd
+try:
+    import polars as pl
+except Exception:
+    pl = None
+try:
+    import pyarrow as pa, pyarrow.csv as pacsv
+except Exception:
+    pa = pacsv = None
 
 DEFAULT_CATEGORIES = [
     "SSH & Credential Abuse",
@@ -36,8 +47,48 @@ DEFAULT_CATEGORIES = [
     "JupyterHub / Open OnDemand",
 ]
 
+class _UnderscoreTable(dict):
+    # str.translate table: ASCII letters/digits map to themselves, any other code point to "_"
+    def __missing__(self, c):
+        return "_"
+
+_SAFE_TBL = _UnderscoreTable((ord(c), c) for c in string.ascii_letters + string.digits)
+
+@functools.lru_cache(maxsize=256)
 def safe_name(s: str) -> str:
-    return re.sub(r'[^A-Za-z0-9]+', '_', s).strip('_')
+    s = s.translate(_SAFE_TBL)
+    while "__" in s:
+        s = s.replace("__", "_")
+    return s.strip("_")
+
+# queue columns that must stay text (pyarrow would otherwise infer timestamps)
+TEXT_COLS = ["ID","URL","Source_Domain","Source_Type","Title","Snippet","Publish_Date",
+             "Category_Guess","Reason","Status","Collected_By","Added_On","Last_Checked"]
+FLAG_COLS = ["RepFlag","SigFlag","Quality2","Quality4"]
+
+def read_queue(path, status_col="Status"):
+    """Multi-threaded pyarrow CSV parse of the memory-mapped file when available, with the small
+    flag columns read as int8; plain pandas otherwise or if the file does not fit those types."""
+    if pacsv is None:
+        return pd.read_csv(path)
+    types = {c: pa.string() for c in TEXT_COLS + [status_col]}
+    types.update({c: pa.int8() for c in FLAG_COLS})
+    try:
+        # parse straight out of the page cache; 16 MiB blocks also widen type inference to the first 16 MiB
+        with pa.memory_map(path) as src:
+            tbl = pacsv.read_csv(
+                src,
+                read_options=pacsv.ReadOptions(block_size=16 << 20),
+                parse_options=pacsv.ParseOptions(newlines_in_values=True),  # Snippet holds raw HTML
+                convert_options=pacsv.ConvertOptions(column_types=types, strings_can_be_null=True),
+            )
+    except pa.ArrowInvalid:
+        return pd.read_csv(path)
+    return tbl.to_pandas()
+
+def write_text(path, text):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
 
 def ensure_cols(df, cols_defaults):
     for c, default in cols_defaults.items():
@@ -47,30 +98,86 @@ def ensure_cols(df, cols_defaults):
 
 def to_numeric(df, cols):
     for c in cols:
-        if c in df.columns:
+        # already-numeric columns without NaN would come back unchanged
+        if c in df.columns and not (pd.api.types.is_numeric_dtype(df[c]) and not df[c].hasnans):
             df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
     return df
 
-def select_for_category(df_cat, n_target, min_quality4, include_rejected=False, status_col="Status"):
-    # Exclude rejected unless explicitly included
-    if not include_rejected and status_col in df_cat.columns:
-        df_cat = df_cat[df_cat[status_col].str.lower().ne("rejected")]
+RANK_KEY = ["Quality4","Quality2","RepFlag","SigFlag","Score"]
 
-    # Priority pool: Quality4 >= threshold
-    strong = df_cat[df_cat["Quality4"] >= min_quality4].copy()
-    weak   = df_cat[df_cat["Quality4"] <  min_quality4].copy()
+def rank_keys(df):
+    """RANK_KEY columns as narrow ints for sorting: flags as int8 when every value fits,
+    Score as its dense rank (int32), which orders exactly like the float itself."""
+    out = {}
+    for c in FLAG_COLS:
+        v = df[c].to_numpy()
+        v8 = v.astype(np.int8)
+        out[c] = v8 if np.array_equal(v, v8) else v
+    out["Score"] = np.unique(df["Score"].to_numpy(), return_inverse=True)[1].astype(np.int32)
+    return {c: out[c] for c in RANK_KEY}
 
-    key = ["Quality4","Quality2","RepFlag","SigFlag","Score"]
-    strong = strong.sort_values(key, ascending=[False]*len(key))
-    weak   = weak.sort_values(key,   ascending=[False]*len(key))
+def polars_keys(df, codes, url_codes, rejected):
+    """Numeric-only frame for the Polars path: row position, category and URL codes, rejected flag and rank keys."""
+    return pl.DataFrame({
+        "_pos": np.arange(len(df)),
+        "_cat": codes,
+        "_url": url_codes,
+        "_rejected": rejected,
+        **rank_keys(df),
+    })
+
+def select_for_category_pl(keys, code, n_target, min_quality4, include_rejected=False):
+    """Lazy plan applying the select_all() policy to one category code of polars_keys();
+    collects to the row positions in rank order."""
+    lf = keys.lazy().filter(pl.col("_cat") == code)
+    if not include_rejected:
+        lf = lf.filter(~pl.col("_rejected"))
+    # strong rows first, then the rank key; maintain_order keeps pandas' stable tie order
+    lf = lf.sort([pl.col("Quality4") >= min_quality4, *RANK_KEY], descending=True, maintain_order=True)
+    lf = lf.head(n_target).unique(subset="_url", keep="first", maintain_order=True)
+    return lf.select("_pos")
 
-    selected = strong.head(n_target)
-    if len(selected) < n_target:
-        need = n_target - len(selected)
-        selected = pd.concat([selected, weak.head(need)], ignore_index=True)
+def _dense(a):
+    return np.unique(a, return_inverse=True)[1].astype(np.int64)
 
-    # Dedup by URL just in case
-    return selected.drop_duplicates(subset=["URL"], keep="first").head(n_target)
+def packed_rank(fields):
+    """Pack sort keys (highest priority first) into one int64 that orders rows exactly like sorting
+    on all of them. Small integer keys keep their offset value, anything else its dense rank; when the
+    next key would not fit, the keys packed so far are replaced by their dense rank, so the total never
+    exceeds 63 bits (dense ranks need at most 31 bits each for fewer than 2**31 rows)."""
+    n = len(fields[0])
+    assert n < 2**31, "packed_rank supports fewer than 2**31 rows"
+    packed = np.zeros(n, dtype=np.int64)
+    used = 0
+    for a in fields:
+        if a.dtype.kind != "f" and n:
+            a = a.astype(np.int64) - int(a.min())
+        if a.dtype.kind == "f" or (n and int(a.max()).bit_length() > 31):
+            a = _dense(a)
+        bits = int(a.max()).bit_length() if n else 0
+        if used + bits > 63:
+            packed = _dense(packed)
+            used = int(packed.max()).bit_length()
+        assert used + bits <= 63
+        packed = (packed << bits) | a
+        used += bits
+    return packed
+
+def select_all(df, codes, url_codes, rejected, n_target, min_quality4, include_rejected=False):
+    """All categories in one pass: the top n_target rows per category by (strong, rank key), ties in
+    input order, then URL dedup within each. Works on row positions only, no intermediate frames.
+    Returns (positions, codes) in rank order."""
+    keep = codes >= 0
+    if not include_rejected:
+        keep &= ~rejected
+    idx = np.flatnonzero(keep)
+    rank = packed_rank([(df["Quality4"] >= min_quality4).to_numpy(np.int8), *rank_keys(df).values()])
+    # heap select per category on one packed key instead of sorting every row on six
+    top = pd.Series(rank[idx], index=idx).groupby(codes[idx]).nlargest(n_target)
+    pos = top.index.get_level_values(-1).to_numpy()
+    c = codes[pos]
+    dup = pd.DataFrame({"_cat": c, "_url": url_codes[pos]}).duplicated().to_numpy()
+    return pos[~dup], c[~dup]
 
 def main():
     ap = argparse.ArgumentParser()
@@ -82,12 +189,13 @@ def main():
     ap.add_argument("--include_rejected", action="store_true", help="Allow selecting items marked Rejected")
     ap.add_argument("--reset_selected", action="store_true", help="Clear existing Status=Selected before selecting")
     ap.add_argument("--status_field", default="Status", help="Column name for selection status (default 'Status')")
+    ap.add_argument("--delta_only", action="store_true", help="Write only the changed Status rows to Status_delta.csv instead of rewriting the queue")
     args = ap.parse_args()
 
     if not os.path.exists(args.in_path):
         print(f"[ERROR] Input not found: {args.in_path}", file=sys.stderr); sys.exit(1)
 
-    df = pd.read_csv(args.in_path)
+    df = read_queue(args.in_path, args.status_field)
 
     # Ensure required columns
     df = ensure_cols(df, {
@@ -99,63 +207,111 @@ def main():
         print("[ERROR] CSV missing 'URL' column.", file=sys.stderr); sys.exit(2)
 
     categories = args.categories or DEFAULT_CATEGORIES
-    present = set(str(x) for x in df["Category_Guess"].dropna().unique())
-    missing = [c for c in categories if c not in present]
+
+    # Selection only reads these columns; the full frame is kept for the outputs, which carry every column
+    sel = df[["URL","Category_Guess",*RANK_KEY]]
+
+    # Category codes once (-1 = not a requested category); presence, counts and grouping all use them
+    cats = list(dict.fromkeys(categories))
+    codes = pd.Index(cats).get_indexer(sel["Category_Guess"])
+    counts = np.bincount(codes[codes >= 0], minlength=len(cats))
+    n_rows = dict(zip(cats, counts))
+    missing = [c for c in categories if not n_rows[c]]
     if missing:
         print(f"[WARN] Categories not found in CSV: {missing}")
 
+    # Lowercased status, once; clearing Selected below never touches the rejected rows
+    status_before = df[args.status_field].copy() if args.delta_only else None
+    status_lc = df[args.status_field].astype("string").str.lower()
+    rejected = status_lc.eq("rejected").fillna(False).to_numpy(bool)
+
     # Optionally clear existing Selected (never clear Rejected)
-    if args.reset_selected and args.status_field in df.columns:
-        mask = df[args.status_field].str.lower().eq("selected")
-        df.loc[mask, args.status_field] = ""
-
-    # Build selections
-    all_selected = []
-    for cat in categories:
-        df_cat = df[df["Category_Guess"] == cat].copy()
-        if df_cat.empty:
+    if args.reset_selected:
+        df.loc[status_lc.eq("selected").fillna(False).to_numpy(bool), args.status_field] = ""
+
+    for cat, n in zip(cats, counts):
+        if not n:
             print(f"[INFO] No rows for category '{cat}'")
-            continue
-        chosen = select_for_category(
-            df_cat, args.per_category, args.min_quality4,
-            include_rejected=args.include_rejected, status_col=args.status_field
-        )
-        chosen["__SelectedCategory"] = cat
-        all_selected.append(chosen)
-
-    if not all_selected:
+    if not counts.any():
         print("[WARN] No selections made."); sys.exit(0)
 
-    winners = pd.concat(all_selected, ignore_index=True).drop_duplicates(subset=["URL"], keep="first")
+    # URL codes stand in for URL strings in dedup and membership tests (NaN -> -1)
+    url_codes, url_uniques = pd.factorize(sel["URL"])
+
+    # Build selections (Polars ranks on numeric keys when available; rows are gathered from df)
+    if pl is not None:
+        keys = polars_keys(sel, codes, url_codes, rejected)
+        todo = [(i, cat) for i, cat in enumerate(cats) if counts[i]]
+        plans = [select_for_category_pl(keys, i, args.per_category, args.min_quality4,
+                                        include_rejected=args.include_rejected) for i, _ in todo]
+        # collect_all runs the per-category plans concurrently on Polars' thread pool
+        picks = [(i, res["_pos"].to_numpy()) for (i, _), res in zip(todo, pl.collect_all(plans))]
+    else:
+        pos, pcodes = select_all(sel, codes, url_codes, rejected, args.per_category, args.min_quality4,
+                                 include_rejected=args.include_rejected)
+        parts = np.split(pos, np.searchsorted(pcodes, np.arange(1, len(cats))))
+        picks = [(i, part) for i, (part, n) in enumerate(zip(parts, counts)) if n]
+
+    # Cross-category dedup while collecting positions: a URL goes to the first category that picked it.
+    # `seen` is indexed by URL code; its last slot is code -1 (NaN URLs).
+    seen = np.zeros(len(url_uniques) + 1, dtype=bool)
+    keep_pos, keep_code = [], []
+    for i, pos in picks:
+        pos = pos[~seen[url_codes[pos]]]
+        seen[url_codes[pos]] = True
+        keep_pos.append(pos)
+        keep_code.append(np.full(len(pos), i))
+    winners = df.iloc[np.concatenate(keep_pos)].reset_index(drop=True)
+    # each winner's Category_Guess is exactly the requested label its code matched
+    winners["__SelectedCategory"] = winners["Category_Guess"]
+    win_codes = np.concatenate(keep_code)
 
     # Update Status in main df (do not overwrite Rejected)
-    status_col = args.status_field
-    if status_col not in df.columns:
-        df[status_col] = ""
-    rejected_mask = df[status_col].str.lower().eq("rejected") if status_col in df.columns else pd.Series(False, index=df.index)
-    sel_mask = df["URL"].isin(winners["URL"]) & ~rejected_mask
-    df.loc[sel_mask, status_col] = "Selected"
+    df.loc[seen[url_codes] & ~rejected, args.status_field] = "Selected"
 
     # Write outputs (same folder as input)
     base_dir = os.path.dirname(os.path.abspath(args.in_path))
-    out_path = args.out_path or os.path.join(base_dir, "Links_Queue_with_selected.csv")
-    df.to_csv(out_path, index=False)
+    if args.delta_only:
+        status = df[args.status_field]
+        changed = ~(status.eq(status_before) | (status.isna() & status_before.isna()))
+        out_path = os.path.join(base_dir, "Status_delta.csv")
+        df.loc[changed, ["URL", args.status_field]].to_csv(out_path, index=False)
+    else:
+        out_path = args.out_path or os.path.join(base_dir, "Links_Queue_with_selected.csv")
+        df.to_csv(out_path, index=False)
 
-    master_path = os.path.join(base_dir, "Selected_master.csv")
-    winners.to_csv(master_path, index=False)
+    # Winners are contiguous per category: split once at code changes, render each block once
+    # (in parallel with the other files' writes) and reuse the text for the master
+    header = winners.head(0).to_csv(index=False)
+    cuts = np.flatnonzero(np.diff(win_codes)) + 1
+    spans = list(zip(np.r_[0, cuts], np.r_[cuts, len(win_codes)])) if len(win_codes) else []
+
+    def write_part(span):
+        a, b = span
+        p = os.path.join(base_dir, f"Selected_{safe_name(cats[win_codes[a]])}.csv")
+        body = winners.iloc[a:b].to_csv(index=False, header=False)
+        write_text(p, header + body)
+        return p, body
 
-    per_cat_paths = []
-    for cat in winners["__SelectedCategory"].unique():
-        sub = winners[winners["__SelectedCategory"] == cat]
-        p = os.path.join(base_dir, f"Selected_{safe_name(cat)}.csv")
-        sub.to_csv(p, index=False)
-        per_cat_paths.append(p)
+    # labels that map to the same file name keep the old last-one-wins order by writing serially
+    names = {safe_name(cats[win_codes[a]]) for a, _ in spans}
+    workers = min(8, len(spans)) if len(names) == len(spans) else 1
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        parts = list(pool.map(write_part, spans))
+    per_cat_paths = [p for p, _ in parts]
+    blocks = [body for _, body in parts]
+
+    master_path = os.path.join(base_dir, "Selected_master.csv")
+    write_text(master_path, header + "".join(blocks))
 
-    summary = winners["__SelectedCategory"].value_counts().rename_axis("Category").reset_index(name="SelectedCount")
+    # Same order as value_counts: count desc, ties in category order; categories without winners omitted
+    win_counts = np.bincount(win_codes, minlength=len(cats))
+    order = [i for i in np.argsort(-win_counts, kind="stable") if win_counts[i]]
+    summary = pd.DataFrame({"Category": [cats[i] for i in order], "SelectedCount": win_counts[order]})
     summary_path = os.path.join(base_dir, "Selected_summary.csv")
     summary.to_csv(summary_path, index=False)
 
-    print(f"[DONE] Updated queue: {out_path}")
+    print(f"[DONE] {'Status delta' if args.delta_only else 'Updated queue'}: {out_path}")
     print(f"[DONE] Master winners: {master_path}")
     print(f"[DONE] Per-category files: {per_cat_paths}")
     print(f"[DONE] Summary: {summary_path}")